@@ -23,6 +23,7 @@ function getTokenizer(): ReturnType<typeof fromPreTrained> {
 interface Env {
   A4F_API_KEY: string;      // Your real A4F API key (secret)
   VALID_API_KEYS: string;   // Comma-separated list of keys you give to users
+  LOG_LEVEL?: string;       // Set to "debug" to log request/response payloads
 }
 
 // Anthropic Types
@@ -91,6 +92,22 @@ interface AnthropicRequest {
   };
 }
 
+interface AnthropicUsage {
+  input_tokens: number;
+  output_tokens: number;
+}
+
+interface AnthropicResponse {
+  id: string;
+  type: "message";
+  role: "assistant";
+  content: AnthropicContentBlock[];
+  model: string;
+  stop_reason: "end_turn" | "max_tokens" | "tool_use";
+  stop_sequence: null;
+  usage: AnthropicUsage;
+}
+
 // OpenAI Types
 interface OpenAIMessage {
   role: "system" | "user" | "assistant" | "tool";
@@ -276,46 +293,193 @@ const CORS_HEADERS = {
     "Content-Type, x-api-key, Authorization, anthropic-version",
 };
 
+// Response header sets are immutable, so build them once instead of
+// spreading CORS_HEADERS into a fresh object on every response
+const JSON_HEADERS = { ...CORS_HEADERS, "Content-Type": "application/json" };
+const SSE_HEADERS = {
+  ...CORS_HEADERS,
+  "Content-Type": "text/event-stream",
+  "Cache-Control": "no-cache",
+  Connection: "keep-alive",
+};
+
+// Pre-encoded SSE framing: event names and the frame terminator never
+// change, so only the JSON payload needs encoding per frame
+const SSE_ENCODER = new TextEncoder();
+const SSE_END = SSE_ENCODER.encode("\n\n");
+
+function sseEventPrefix(event: string): Uint8Array {
+  return SSE_ENCODER.encode(`event: ${event}\ndata: `);
+}
+
+/**
+ * Check whether a byte range starts with the SSE "data: " prefix, so
+ * non-data lines (blank keep-alives, event/comment lines) are skipped
+ * without ever being decoded
+ */
+function isDataLine(buf: Uint8Array, start: number, end: number): boolean {
+  if (end - start < SSE_DATA_PREFIX.length) return false;
+  for (let i = 0; i < SSE_DATA_PREFIX.length; i++) {
+    if (buf[start + i] !== SSE_DATA_PREFIX[i]) return false;
+  }
+  return true;
+}
+
+const EV_MESSAGE_START = sseEventPrefix("message_start");
+const EV_CONTENT_BLOCK_START = sseEventPrefix("content_block_start");
+const EV_CONTENT_BLOCK_DELTA = sseEventPrefix("content_block_delta");
+const EV_CONTENT_BLOCK_STOP = sseEventPrefix("content_block_stop");
+const EV_MESSAGE_DELTA = sseEventPrefix("message_delta");
+const EV_MESSAGE_STOP = sseEventPrefix("message_stop");
+const EV_ERROR = sseEventPrefix("error");
+
+// Upper bound on a single upstream SSE line. A malformed frame that never
+// delivers a newline would otherwise grow the parser's carry-over buffer
+// without limit
+const MAX_SSE_LINE_BYTES = 4 * 1024 * 1024;
+
+// "data: " as bytes, so SSE framing is checked before any text decoding
+const SSE_DATA_PREFIX = SSE_ENCODER.encode("data: ");
+
+// Matches the raw (still-escaped) JSON string value of delta.content in an
+// upstream chunk. Quotes inside the value are escaped, so the first match is
+// always the real key, never text content
+const TEXT_DELTA_RE = /"content":"((?:[^"\\]|\\.)*)"/;
+
 // ============================================================================
 // Utility Functions
 // ============================================================================
 
-function generateMessageId(): string {
-  const chars = "abcdefghijklmnopqrstuvwxyz0123456789";
-  let result = "msg_";
-  for (let i = 0; i < 24; i++) {
-    result += chars.charAt(Math.floor(Math.random() * chars.length));
+/**
+ * Build a complete SSE frame from a pre-encoded event prefix and an
+ * already-serialized JSON payload
+ */
+function sseFrameRaw(prefix: Uint8Array, json: string): Uint8Array {
+  const payload = SSE_ENCODER.encode(json);
+  const frame = new Uint8Array(prefix.length + payload.length + SSE_END.length);
+  frame.set(prefix);
+  frame.set(payload, prefix.length);
+  frame.set(SSE_END, prefix.length + payload.length);
+  return frame;
+}
+
+/**
+ * Build a complete SSE frame from a pre-encoded event prefix and a payload
+ */
+function sseFrame(prefix: Uint8Array, payload: unknown): Uint8Array {
+  return sseFrameRaw(prefix, JSON.stringify(payload));
+}
+
+/**
+ * Whether payload-level debug logging is enabled
+ * Callers must check this before building log strings so JSON.stringify
+ * never runs on the request hot path in normal operation
+ */
+function debugEnabled(env: Env): boolean {
+  return env.LOG_LEVEL?.toLowerCase() === "debug";
+}
+
+// Pooled randomness for id generation. The pool is refilled in one bulk
+// crypto.getRandomValues call and sliced per id, amortizing the entropy
+// request across hundreds of ids instead of drawing per character
+const RAND_POOL_SIZE = 4096;
+const randPool = new Uint8Array(RAND_POOL_SIZE);
+let randPoolOffset = RAND_POOL_SIZE; // forces a fill on first use
+
+function randomHex(byteLength: number): string {
+  if (randPoolOffset + byteLength > RAND_POOL_SIZE) {
+    crypto.getRandomValues(randPool);
+    randPoolOffset = 0;
   }
-  return result;
+  let hex = "";
+  for (let i = 0; i < byteLength; i++) {
+    hex += (randPool[randPoolOffset + i] ?? 0).toString(16).padStart(2, "0");
+  }
+  randPoolOffset += byteLength;
+  return hex;
+}
+
+function generateMessageId(): string {
+  return `msg_${randomHex(12)}`;
 }
 
 function generateCallId(): string {
-  const chars = "abcdefghijklmnopqrstuvwxyz0123456789";
-  let result = "call_";
-  for (let i = 0; i < 12; i++) {
-    result += chars.charAt(Math.floor(Math.random() * chars.length));
-  }
-  return result;
+  return `call_${randomHex(6)}`;
 }
 
+// LRU cache for token counts. Chat loops resend the same system prompts,
+// tool schemas, and prior messages on every request, so recurring fragments
+// become an O(1) Map lookup instead of a full BPE encode. Map preserves
+// insertion order, so the first key is always the least recently used.
+// The cache is bounded by entry count AND total key characters: the keys
+// are user-controlled strings and a Workers isolate only has 128 MB, so
+// the character budget (UTF-16, so ~2x in bytes) caps worst-case memory
+// no matter what mix of fragment sizes arrives
+const TOKEN_CACHE_MAX_ENTRIES = 4096;
+const TOKEN_CACHE_MAX_TEXT_LENGTH = 64 * 1024; // don't cache huge strings
+const TOKEN_CACHE_MAX_TOTAL_CHARS = 2 * 1024 * 1024;
+const tokenCountCache = new Map<string, number>();
+let tokenCountCacheChars = 0;
+
 /**
  * Count tokens using the Claude tokenizer
  * Uses @lenml/tokenizer-claude for accurate token counting
+ * Results for short strings are memoized in an LRU cache
  */
 function countTokens(text: string): number {
+  const cacheable = text.length <= TOKEN_CACHE_MAX_TEXT_LENGTH;
+
+  if (cacheable) {
+    const cached = tokenCountCache.get(text);
+    if (cached !== undefined) {
+      // Refresh recency by re-inserting at the end
+      tokenCountCache.delete(text);
+      tokenCountCache.set(text, cached);
+      return cached;
+    }
+  }
+
   const tok = getTokenizer();
   const encoded = tok.encode(text, { add_special_tokens: false });
+
+  if (cacheable) {
+    // Evict least-recently-used entries until both bounds hold
+    while (
+      tokenCountCache.size > 0 &&
+      (tokenCountCache.size >= TOKEN_CACHE_MAX_ENTRIES ||
+        tokenCountCacheChars + text.length > TOKEN_CACHE_MAX_TOTAL_CHARS)
+    ) {
+      const oldest = tokenCountCache.keys().next().value;
+      if (oldest === undefined) break;
+      tokenCountCache.delete(oldest);
+      tokenCountCacheChars -= oldest.length;
+    }
+    tokenCountCache.set(text, encoded.length);
+    tokenCountCacheChars += text.length;
+  }
+
   return encoded.length;
 }
 
+/**
+ * Count tokens for a batch of text fragments
+ * The pure-JS tokenizer has no native batch API, so this funnels every
+ * fragment through countTokens (and its LRU cache) in one place rather
+ * than scattering per-fragment calls across the request walkers
+ */
+function countTokensBatch(texts: string[]): number[] {
+  return texts.map(countTokens);
+}
+
 function contentToString(
   content: string | AnthropicContentBlock[]
 ): string {
   if (typeof content === "string") return content;
-  return content
-    .filter((b): b is AnthropicTextBlock => b.type === "text")
-    .map((b) => b.text)
-    .join("");
+  let result = "";
+  for (const b of content) {
+    if (b.type === "text") result += b.text;
+  }
+  return result;
 }
 
 function extractApiKey(request: Request): string | null {
@@ -332,17 +496,30 @@ function extractApiKey(request: Request): string | null {
   return null;
 }
 
+// Parsed VALID_API_KEYS cache. The secret is the same string on every
+// request within an isolate, so the CSV is split once and membership
+// becomes a Set lookup instead of a per-request split/trim/scan
+let validKeysCacheSource = "";
+let validKeysCache: Set<string> | null = null;
+
 /**
  * Validate user API key against the list of valid keys
  */
 function validateUserApiKey(userKey: string, validKeysString: string): boolean {
   if (!validKeysString) return false;
-  const validKeys = validKeysString.split(",").map((k) => k.trim()).filter((k) => k.length > 0);
-  return validKeys.includes(userKey);
+  if (validKeysCache === null || validKeysCacheSource !== validKeysString) {
+    validKeysCacheSource = validKeysString;
+    validKeysCache = new Set(
+      validKeysString.split(",").map((k) => k.trim()).filter((k) => k.length > 0)
+    );
+  }
+  return validKeysCache.has(userKey);
 }
 
 function validateModel(model: string): { valid: boolean; error?: string } {
-  if (!model.includes("claude")) {
+  // Clients send bare model names (e.g. claude-sonnet-4-20250514); a fixed
+  // prefix check is cheaper than a substring scan and matches the intent
+  if (!model.startsWith("claude")) {
     return {
       valid: false,
       error: `Model "${model}" is not a Claude model. Only Claude models are supported.`,
@@ -363,13 +540,16 @@ function convertMessages(
 
   // Add system message if present
   if (system) {
-    const systemText =
-      typeof system === "string"
-        ? system
-        : system
-            .filter((b) => b.type === "text")
-            .map((b) => b.text)
-            .join("\n");
+    let systemText: string;
+    if (typeof system === "string") {
+      systemText = system;
+    } else {
+      const parts: string[] = [];
+      for (const b of system) {
+        if (b.type === "text") parts.push(b.text);
+      }
+      systemText = parts.join("\n");
+    }
     result.push({ role: "system", content: systemText });
   }
 
@@ -381,19 +561,28 @@ function convertMessages(
       continue;
     }
 
-    // Handle content blocks
-    const toolUseBlocks = content.filter(
-      (b): b is AnthropicToolUseBlock => b.type === "tool_use"
-    );
-    const toolResultBlocks = content.filter(
-      (b): b is AnthropicToolResultBlock => b.type === "tool_result"
-    );
-    const textBlocks = content.filter(
-      (b): b is AnthropicTextBlock => b.type === "text"
-    );
-    const imageBlocks = content.filter(
-      (b): b is AnthropicImageBlock => b.type === "image"
-    );
+    // Handle content blocks - bucketize by type in a single pass
+    const toolUseBlocks: AnthropicToolUseBlock[] = [];
+    const toolResultBlocks: AnthropicToolResultBlock[] = [];
+    const textBlocks: AnthropicTextBlock[] = [];
+    const imageBlocks: AnthropicImageBlock[] = [];
+
+    for (const b of content) {
+      switch (b.type) {
+        case "tool_use":
+          toolUseBlocks.push(b);
+          break;
+        case "tool_result":
+          toolResultBlocks.push(b);
+          break;
+        case "text":
+          textBlocks.push(b);
+          break;
+        case "image":
+          imageBlocks.push(b);
+          break;
+      }
+    }
 
     if (toolUseBlocks.length > 0 && role === "assistant") {
       // Assistant message with tool calls
@@ -427,6 +616,13 @@ function convertMessages(
       }
     } else if (imageBlocks.length > 0 || textBlocks.length > 0) {
       // Mixed content (text and/or images)
+      // Common case first: a single text block needs no parts array at all
+      const onlyText = textBlocks[0];
+      if (imageBlocks.length === 0 && textBlocks.length === 1 && onlyText && onlyText.text) {
+        result.push({ role, content: onlyText.text });
+        continue;
+      }
+
       const parts: OpenAIContentPart[] = [];
 
       for (const block of content) {
@@ -443,13 +639,7 @@ function convertMessages(
         }
       }
 
-      // Simplify if only one text part
-      const firstPart = parts[0];
-      if (parts.length === 1 && firstPart && firstPart.type === "text" && firstPart.text) {
-        result.push({ role, content: firstPart.text });
-      } else {
-        result.push({ role, content: parts });
-      }
+      result.push({ role, content: parts });
     }
   }
 
@@ -553,10 +743,10 @@ function convertResponse(
   res: OpenAIResponse,
   model: string,
   inputTokens: number
-): Record<string, unknown> {
+): AnthropicResponse {
   const choice = res.choices?.[0];
   const message = choice?.message;
-  const content: Array<Record<string, unknown>> = [];
+  const content: AnthropicContentBlock[] = [];
 
   // Accumulate output text for local token counting
   let outputText = "";
@@ -578,7 +768,7 @@ function convertResponse(
       content.push({
         type: "tool_use",
         id: tc.id,
-        name: tc.function?.name,
+        name: tc.function?.name || "",
         input,
       });
       // Include tool call arguments in token count
@@ -609,15 +799,16 @@ function convertResponse(
 // ============================================================================
 
 function estimateRequestTokens(openaiReq: OpenAIRequest): number {
-  let total = 0;
+  // Gather every text fragment first, then count them in one batch call
+  const fragments: string[] = [];
 
   for (const msg of openaiReq.messages) {
     if (typeof msg.content === "string") {
-      total += countTokens(msg.content);
+      fragments.push(msg.content);
     } else if (Array.isArray(msg.content)) {
       for (const part of msg.content) {
         if (part.type === "text" && part.text) {
-          total += countTokens(part.text);
+          fragments.push(part.text);
         }
       }
     }
@@ -626,12 +817,39 @@ function estimateRequestTokens(openaiReq: OpenAIRequest): number {
 
   // Add tool definitions if present
   if (openaiReq.tools) {
-    total += countTokens(JSON.stringify(openaiReq.tools));
+    fragments.push(JSON.stringify(openaiReq.tools));
   }
 
+  let total = 0;
+  for (const count of countTokensBatch(fragments)) {
+    total += count;
+  }
   return total;
 }
 
+/**
+ * Cheap input-token estimate (~4 chars per token) for the streaming
+ * message_start placeholder, where the real count arrives later in the
+ * upstream usage frame. Avoids running full BPE over the whole prompt on
+ * the hot path; /v1/messages/count_tokens keeps the exact tokenizer walk
+ * since the precise number is that endpoint's contract
+ */
+function fastEstimateInputTokens(openaiReq: OpenAIRequest): number {
+  let chars = 0;
+  for (const msg of openaiReq.messages) {
+    if (typeof msg.content === "string") {
+      chars += msg.content.length;
+    } else if (Array.isArray(msg.content)) {
+      for (const part of msg.content) {
+        if (part.type === "text" && part.text) {
+          chars += part.text.length;
+        }
+      }
+    }
+  }
+  return Math.ceil(chars / 4);
+}
+
 // ============================================================================
 // Streaming Handler
 // ============================================================================
@@ -639,17 +857,18 @@ function estimateRequestTokens(openaiReq: OpenAIRequest): number {
 async function streamAndConvert(
   apiKey: string,
   openaiReq: OpenAIRequest,
+  openaiBody: string,
   model: string
 ): Promise<ReadableStream<Uint8Array>> {
-  const encoder = new TextEncoder();
   const msgId = generateMessageId();
-  const estimatedInputTokens = estimateRequestTokens(openaiReq);
+  const estimatedInputTokens = fastEstimateInputTokens(openaiReq);
 
   let accumulatedText = ""; // Accumulate all output text for token counting
   let contentIndex = 0;
   let textStarted = false;
   let toolStarted = false;
   let stopReason: "end_turn" | "max_tokens" | "tool_use" = "end_turn";
+  let upstreamUsage: OpenAIStreamChunk["usage"];
 
   return new ReadableStream({
     async start(controller) {
@@ -670,11 +889,7 @@ async function streamAndConvert(
           },
         },
       };
-      controller.enqueue(
-        encoder.encode(
-          `event: message_start\ndata: ${JSON.stringify(messageStart)}\n\n`
-        )
-      );
+      controller.enqueue(sseFrame(EV_MESSAGE_START, messageStart));
 
       try {
         const response = await fetch(`${A4F_BASE_URL}/chat/completions`, {
@@ -683,7 +898,7 @@ async function streamAndConvert(
             "Content-Type": "application/json",
             Authorization: `Bearer ${apiKey}`,
           },
-          body: JSON.stringify(openaiReq),
+          body: openaiBody,
         });
 
         if (!response.ok) {
@@ -695,11 +910,7 @@ async function streamAndConvert(
               message: errorBody,
             },
           };
-          controller.enqueue(
-            encoder.encode(
-              `event: error\ndata: ${JSON.stringify(errorEvent)}\n\n`
-            )
-          );
+          controller.enqueue(sseFrame(EV_ERROR, errorEvent));
           controller.close();
           return;
         }
@@ -711,33 +922,112 @@ async function streamAndConvert(
         }
 
         const decoder = new TextDecoder();
-        let buffer = "";
+        // Carry-over bytes for a line split across reads. Scanning the raw
+        // bytes for the newline byte avoids decoding and re-splitting the
+        // whole buffer on every chunk; only complete lines get decoded, and
+        // multi-byte characters can never straddle a newline boundary.
+        let leftover = new Uint8Array(0);
 
         while (true) {
           const { done, value } = await reader.read();
           if (done) break;
 
-          buffer += decoder.decode(value, { stream: true });
-          const lines = buffer.split("\n");
-          buffer = lines.pop() || "";
+          // Refuse to buffer a line past the cap instead of growing forever
+          if (leftover.length + value.length > MAX_SSE_LINE_BYTES) {
+            const errorEvent = {
+              type: "error",
+              error: {
+                type: "api_error",
+                message: "Upstream SSE line exceeded maximum length",
+              },
+            };
+            controller.enqueue(sseFrame(EV_ERROR, errorEvent));
+            controller.close();
+            return;
+          }
+
+          let buf: Uint8Array;
+          if (leftover.length > 0) {
+            buf = new Uint8Array(leftover.length + value.length);
+            buf.set(leftover);
+            buf.set(value, leftover.length);
+          } else {
+            buf = value;
+          }
+
+          let start = 0;
+          let newlineIndex: number;
+          while ((newlineIndex = buf.indexOf(0x0a, start)) !== -1) {
+            const lineStart = start;
+            start = newlineIndex + 1;
 
-          for (const line of lines) {
-            if (!line.startsWith("data: ")) continue;
+            if (!isDataLine(buf, lineStart, newlineIndex)) continue;
 
+            const line = decoder.decode(buf.subarray(lineStart, newlineIndex));
             const data = line.slice(6);
             if (data === "[DONE]") continue;
 
+            // Fast path: the overwhelming majority of frames are plain
+            // text deltas. Splice the raw JSON string value straight from
+            // the upstream line into the Anthropic frame instead of
+            // parsing and re-serializing the whole chunk; anything
+            // unusual (tool calls, a finish reason, the usage frame)
+            // falls through to the full parser below
+            if (
+              line.includes('"finish_reason":null') &&
+              !line.includes('"tool_calls"')
+            ) {
+              const match = TEXT_DELTA_RE.exec(line);
+              if (match && match[1]) {
+                const rawText = match[1];
+                // Decode just the text fragment for local token counting.
+                // Done first and inside a try: an invalid escape or raw
+                // control character throws, and the line must then fall
+                // through to the tolerant full parser below (which skips
+                // malformed JSON) without any frames having been emitted
+                let decodedText: string | null = null;
+                try {
+                  decodedText = JSON.parse(`"${rawText}"`);
+                } catch {
+                  // Fall through to the full parser
+                }
+
+                if (decodedText !== null) {
+                  if (!textStarted) {
+                    textStarted = true;
+                    const blockStart = {
+                      type: "content_block_start",
+                      index: contentIndex,
+                      content_block: {
+                        type: "text",
+                        text: "",
+                      },
+                    };
+                    controller.enqueue(sseFrame(EV_CONTENT_BLOCK_START, blockStart));
+                  }
+
+                  accumulatedText += decodedText;
+
+                  controller.enqueue(
+                    sseFrameRaw(
+                      EV_CONTENT_BLOCK_DELTA,
+                      `{"type":"content_block_delta","index":${contentIndex},"delta":{"type":"text_delta","text":"${rawText}"}}`
+                    )
+                  );
+                  continue;
+                }
+              }
+            }
+
             try {
               const chunk: OpenAIStreamChunk = JSON.parse(data);
               const choice = chunk.choices?.[0];
               const delta = choice?.delta;
 
-              // Note: We no longer use A4F's token count - we count locally
-
-              // Track finish reason
-              if (choice?.finish_reason) {
-                stopReason = mapFinishReason(choice.finish_reason);
-              }
+              // Frames reaching this fallback are mostly tool-argument
+              // deltas (plain text deltas take the fast path above), so
+              // handle the per-token delta fields before the bookkeeping
+              // fields that appear once per stream
 
               // Handle text content
               if (delta?.content) {
@@ -751,11 +1041,7 @@ async function streamAndConvert(
                       text: "",
                     },
                   };
-                  controller.enqueue(
-                    encoder.encode(
-                      `event: content_block_start\ndata: ${JSON.stringify(blockStart)}\n\n`
-                    )
-                  );
+                  controller.enqueue(sseFrame(EV_CONTENT_BLOCK_START, blockStart));
                 }
 
                 // Accumulate text for local token counting
@@ -769,11 +1055,7 @@ async function streamAndConvert(
                     text: delta.content,
                   },
                 };
-                controller.enqueue(
-                  encoder.encode(
-                    `event: content_block_delta\ndata: ${JSON.stringify(blockDelta)}\n\n`
-                  )
-                );
+                controller.enqueue(sseFrame(EV_CONTENT_BLOCK_DELTA, blockDelta));
               }
 
               // Handle tool calls
@@ -786,11 +1068,7 @@ async function streamAndConvert(
                         type: "content_block_stop",
                         index: contentIndex,
                       };
-                      controller.enqueue(
-                        encoder.encode(
-                          `event: content_block_stop\ndata: ${JSON.stringify(blockStop)}\n\n`
-                        )
-                      );
+                      controller.enqueue(sseFrame(EV_CONTENT_BLOCK_STOP, blockStop));
                       contentIndex++;
                       textStarted = false;
                     }
@@ -800,11 +1078,7 @@ async function streamAndConvert(
                         type: "content_block_stop",
                         index: contentIndex,
                       };
-                      controller.enqueue(
-                        encoder.encode(
-                          `event: content_block_stop\ndata: ${JSON.stringify(blockStop)}\n\n`
-                        )
-                      );
+                      controller.enqueue(sseFrame(EV_CONTENT_BLOCK_STOP, blockStop));
                       contentIndex++;
                     }
 
@@ -819,11 +1093,7 @@ async function streamAndConvert(
                         input: {},
                       },
                     };
-                    controller.enqueue(
-                      encoder.encode(
-                        `event: content_block_start\ndata: ${JSON.stringify(toolStart)}\n\n`
-                      )
-                    );
+                    controller.enqueue(sseFrame(EV_CONTENT_BLOCK_START, toolStart));
                   }
 
                   if (tc.function?.arguments) {
@@ -838,18 +1108,25 @@ async function streamAndConvert(
                         partial_json: tc.function.arguments,
                       },
                     };
-                    controller.enqueue(
-                      encoder.encode(
-                        `event: content_block_delta\ndata: ${JSON.stringify(toolDelta)}\n\n`
-                      )
-                    );
+                    controller.enqueue(sseFrame(EV_CONTENT_BLOCK_DELTA, toolDelta));
                   }
                 }
               }
+
+              // Bookkeeping fields: the finish reason and the usage frame
+              // each appear at most once per stream
+              if (choice?.finish_reason) {
+                stopReason = mapFinishReason(choice.finish_reason);
+              }
+              if (chunk.usage) {
+                upstreamUsage = chunk.usage;
+              }
             } catch {
               // Skip malformed JSON
             }
           }
+
+          leftover = start < buf.length ? buf.slice(start) : new Uint8Array(0);
         }
 
         // Close content blocks
@@ -858,17 +1135,15 @@ async function streamAndConvert(
             type: "content_block_stop",
             index: contentIndex,
           };
-          controller.enqueue(
-            encoder.encode(
-              `event: content_block_stop\ndata: ${JSON.stringify(blockStop)}\n\n`
-            )
-          );
+          controller.enqueue(sseFrame(EV_CONTENT_BLOCK_STOP, blockStop));
         }
 
         // Count output tokens locally using our Claude tokenizer
         const outputTokens = countTokens(accumulatedText);
 
-        // Send message_delta with final usage
+        // Send message_delta with final usage. Output tokens are still
+        // counted locally with the Claude tokenizer; input tokens are
+        // corrected from the upstream usage frame when A4F provides one
         const messageDelta = {
           type: "message_delta",
           delta: {
@@ -876,22 +1151,15 @@ async function streamAndConvert(
             stop_sequence: null,
           },
           usage: {
+            input_tokens: upstreamUsage?.prompt_tokens ?? estimatedInputTokens,
             output_tokens: outputTokens,
           },
         };
-        controller.enqueue(
-          encoder.encode(
-            `event: message_delta\ndata: ${JSON.stringify(messageDelta)}\n\n`
-          )
-        );
+        controller.enqueue(sseFrame(EV_MESSAGE_DELTA, messageDelta));
 
         // Send message_stop
         const messageStop = { type: "message_stop" };
-        controller.enqueue(
-          encoder.encode(
-            `event: message_stop\ndata: ${JSON.stringify(messageStop)}\n\n`
-          )
-        );
+        controller.enqueue(sseFrame(EV_MESSAGE_STOP, messageStop));
 
         controller.close();
       } catch (error) {
@@ -902,11 +1170,7 @@ async function streamAndConvert(
             message: error instanceof Error ? error.message : String(error),
           },
         };
-        controller.enqueue(
-          encoder.encode(
-            `event: error\ndata: ${JSON.stringify(errorEvent)}\n\n`
-          )
-        );
+        controller.enqueue(sseFrame(EV_ERROR, errorEvent));
         controller.close();
       }
     },
@@ -931,7 +1195,7 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
       }),
       {
         status: 401,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
@@ -948,7 +1212,7 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
       }),
       {
         status: 401,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
@@ -966,7 +1230,7 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
       }),
       {
         status: 500,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
@@ -986,7 +1250,7 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
       }),
       {
         status: 400,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
@@ -1004,7 +1268,7 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
       }),
       {
         status: 400,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
@@ -1012,16 +1276,20 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
   // Convert request
   const openaiReq = convertRequest(body);
 
+  if (debugEnabled(env)) {
+    console.log(`=== Anthropic Request ===\n${JSON.stringify(body, null, 2)}`);
+    console.log(`=== OpenAI Request ===\n${JSON.stringify(openaiReq, null, 2)}`);
+  }
+
+  // Serialize the upstream body once; both the streaming and
+  // non-streaming branches send the same bytes
+  const openaiBody = JSON.stringify(openaiReq);
+
   // Handle streaming
   if (body.stream) {
-    const stream = await streamAndConvert(a4fApiKey, openaiReq, body.model);
+    const stream = await streamAndConvert(a4fApiKey, openaiReq, openaiBody, body.model);
     return new Response(stream, {
-      headers: {
-        ...CORS_HEADERS,
-        "Content-Type": "text/event-stream",
-        "Cache-Control": "no-cache",
-        Connection: "keep-alive",
-      },
+      headers: SSE_HEADERS,
     });
   }
 
@@ -1033,7 +1301,7 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
         "Content-Type": "application/json",
         Authorization: `Bearer ${a4fApiKey}`,
       },
-      body: JSON.stringify(openaiReq),
+      body: openaiBody,
     });
 
     if (!response.ok) {
@@ -1048,18 +1316,20 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
         }),
         {
           status: response.status,
-          headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+          headers: JSON_HEADERS,
         }
       );
     }
 
     const openaiResponse = (await response.json()) as OpenAIResponse;
-    // Calculate input tokens locally for consistency
-    const inputTokens = estimateRequestTokens(openaiReq);
+    // Prefer the upstream input-token count; only run the local tokenizer
+    // walk when A4F omits usage
+    const inputTokens =
+      openaiResponse.usage?.prompt_tokens ?? estimateRequestTokens(openaiReq);
     const anthropicResponse = convertResponse(openaiResponse, body.model, inputTokens);
 
     return new Response(JSON.stringify(anthropicResponse), {
-      headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+      headers: JSON_HEADERS,
     });
   } catch (error) {
     return new Response(
@@ -1072,7 +1342,7 @@ async function handleMessages(request: Request, env: Env): Promise<Response> {
       }),
       {
         status: 500,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
@@ -1093,48 +1363,53 @@ async function handleCountTokens(request: Request): Promise<Response> {
       }),
       {
         status: 400,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
 
-  let totalTokens = 0;
+  // Gather every text fragment, then count them in one batch call
+  const fragments: string[] = [];
 
-  // Count system prompt tokens
+  // System prompt fragments
   if (body.system) {
     if (typeof body.system === "string") {
-      totalTokens += countTokens(body.system);
+      fragments.push(body.system);
     } else {
       for (const block of body.system) {
         if (block.type === "text" && block.text) {
-          totalTokens += countTokens(block.text);
+          fragments.push(block.text);
         }
       }
     }
   }
 
-  // Count message tokens
+  // Message fragments
   for (const msg of body.messages || []) {
     if (typeof msg.content === "string") {
-      totalTokens += countTokens(msg.content);
+      fragments.push(msg.content);
     } else if (Array.isArray(msg.content)) {
       for (const block of msg.content) {
         if (block.type === "text" && "text" in block) {
-          totalTokens += countTokens(block.text);
+          fragments.push(block.text);
         }
       }
     }
   }
 
-  // Count tool definitions tokens
+  // Tool definitions
   if (body.tools) {
-    totalTokens += countTokens(JSON.stringify(body.tools));
+    fragments.push(JSON.stringify(body.tools));
   }
 
   // No overhead added - count raw tokens only for accuracy
+  let totalTokens = 0;
+  for (const count of countTokensBatch(fragments)) {
+    totalTokens += count;
+  }
 
   return new Response(JSON.stringify({ input_tokens: totalTokens }), {
-    headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+    headers: JSON_HEADERS,
   });
 }
 
@@ -1142,7 +1417,7 @@ function handleHealth(): Response {
   return new Response(
     JSON.stringify({ status: "ok", service: "devkit-anthropic-proxy" }),
     {
-      headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+      headers: JSON_HEADERS,
     }
   );
 }
@@ -1181,7 +1456,7 @@ async function handleModels(env: Env): Promise<Response> {
         }),
         {
           status: response.status,
-          headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+          headers: JSON_HEADERS,
         }
       );
     }
@@ -1216,7 +1491,7 @@ async function handleModels(env: Env): Promise<Response> {
     };
 
     return new Response(JSON.stringify(models), {
-      headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+      headers: JSON_HEADERS,
     });
   } catch (error) {
     return new Response(
@@ -1229,7 +1504,7 @@ async function handleModels(env: Env): Promise<Response> {
       }),
       {
         status: 500,
-        headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+        headers: JSON_HEADERS,
       }
     );
   }
@@ -1254,7 +1529,7 @@ function handleNotFound(request: Request): Response {
     }),
     {
       status: 404,
-      headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+      headers: JSON_HEADERS,
     }
   );
 }
@@ -1282,7 +1557,7 @@ function createOpenAIError(
     }),
     {
       status,
-      headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+      headers: JSON_HEADERS,
     }
   );
 }
@@ -1361,12 +1636,7 @@ async function handleChatCompletions(
 
       // Pass through the stream directly
       return new Response(response.body, {
-        headers: {
-          ...CORS_HEADERS,
-          "Content-Type": "text/event-stream",
-          "Cache-Control": "no-cache",
-          Connection: "keep-alive",
-        },
+        headers: SSE_HEADERS,
       });
     } catch (error) {
       return createOpenAIError(
@@ -1397,10 +1667,10 @@ async function handleChatCompletions(
       );
     }
 
-    const openaiResponse = await response.json();
-
-    return new Response(JSON.stringify(openaiResponse), {
-      headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+    // Pure pass-through: forward the upstream body without a parse +
+    // re-stringify round trip
+    return new Response(response.body, {
+      headers: JSON_HEADERS,
     });
   } catch (error) {
     return createOpenAIError(
@@ -1638,12 +1908,7 @@ function convertResponsesToSSE(response: ResponsesResponse): Response {
   });
 
   return new Response(stream, {
-    headers: {
-      ...CORS_HEADERS,
-      "Content-Type": "text/event-stream",
-      "Cache-Control": "no-cache",
-      Connection: "keep-alive",
-    },
+    headers: SSE_HEADERS,
   });
 }
 
@@ -1739,12 +2004,7 @@ async function handleResponses(
 
       // Pass through the stream directly
       return new Response(response.body, {
-        headers: {
-          ...CORS_HEADERS,
-          "Content-Type": "text/event-stream",
-          "Cache-Control": "no-cache",
-          Connection: "keep-alive",
-        },
+        headers: SSE_HEADERS,
       });
     } catch (error) {
       return createOpenAIError(
@@ -1784,7 +2044,7 @@ async function handleResponses(
     };
 
     return new Response(JSON.stringify(modifiedResponse), {
-      headers: { ...CORS_HEADERS, "Content-Type": "application/json" },
+      headers: JSON_HEADERS,
     });
   } catch (error) {
     return createOpenAIError(
@@ -1803,7 +2063,7 @@ export default {
   async fetch(
     request: Request,
     env: Env,
-    _ctx: ExecutionContext
+    ctx: ExecutionContext
   ): Promise<Response> {
     const url = new URL(request.url);
     let { pathname } = url;
@@ -1843,6 +2103,13 @@ export default {
     }
 
     if (pathname === "/health" && method === "GET") {
+      // Health checks return synchronously, making this the one route where
+      // a cold-isolate tokenizer warm-up is genuinely background work: the
+      // vocab load runs after the response is produced, so uptime-monitor
+      // pings warm the singleton without delaying any real request
+      if (!tokenizer) {
+        ctx.waitUntil(Promise.resolve().then(() => void getTokenizer()));
+      }
       return handleHealth();
     }
 
@@ -1853,4 +2120,34 @@ export default {
     // Catch-all for unhandled routes
     return handleNotFound(request);
   },
+
+  /**
+   * Cron-triggered keep-warm ping (see [triggers] in wrangler.toml)
+   * Workers can't hold background timers between requests, so a scheduled
+   * trigger periodically touches the upstream instead, keeping the
+   * edge-to-origin TLS connections and this isolate warm so the first user
+   * request after idle skips the connection setup round trips
+   */
+  async scheduled(
+    _controller: ScheduledController,
+    env: Env,
+    ctx: ExecutionContext
+  ): Promise<void> {
+    // Cron runs have no user request to delay, so also warm the tokenizer
+    // on a cold isolate
+    if (!tokenizer) {
+      ctx.waitUntil(Promise.resolve().then(() => void getTokenizer()));
+    }
+    ctx.waitUntil(
+      fetch(`${A4F_BASE_URL}/models`, {
+        method: "HEAD",
+        headers: {
+          Authorization: `Bearer ${env.A4F_API_KEY}`,
+        },
+      }).then(
+        () => undefined,
+        () => undefined // best-effort: a failed ping never matters
+      )
+    );
+  },
 };
\ No newline at end of file